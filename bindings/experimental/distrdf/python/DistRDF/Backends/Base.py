@@ -15,6 +15,7 @@ from abc import ABCMeta
 from abc import abstractmethod
 
 import ROOT
+from DistRDF import Ranges
 from DistRDF.Backends import Utils
 from DistRDF.HeadNode import TreeHeadNode
 
@@ -24,6 +25,99 @@ from DistRDF.HeadNode import TreeHeadNode
 ABC = ABCMeta("ABC", (object,), {})
 
 
+def _get_friend_paths(friend_info):
+    """
+    Converts the information about friend trees of the dataset to plain Python
+    objects holding the full paths of the trees of each friend.
+
+    Args:
+        friend_info (ROOT.Internal.TreeUtils.RFriendInfo, None): Information
+            about friend trees, or None if the tree has no friends.
+
+    Returns:
+        list[tuple]: One (name, alias, paths) tuple per friend tree, where
+        paths is the list of "filename/treename" strings to add to the chain
+        of the friend. Empty if there are no friends.
+    """
+    if friend_info is None:
+        return []
+
+    # Zip together the information about friend trees. Each element of the
+    # iterator represents a single friend tree.
+    # If the friend is a TChain, the zipped information looks like:
+    # (name, alias), (file1.root, file2.root, ...), (subname1, subname2, ...)
+    # If the friend is a TTree, the file list is made of only one filename and
+    # the list of names of the sub trees is empty, so the zipped information
+    # looks like:
+    # (name, alias), (filename.root, ), ()
+    zipped_friend_info = zip(
+        friend_info.fFriendNames,
+        friend_info.fFriendFileNames,
+        friend_info.fFriendChainSubNames
+    )
+    friends = []
+    for (friend_name, friend_alias), friend_filenames, friend_chainsubnames in zipped_friend_info:
+        if friend_chainsubnames.empty():
+            # This friend is a TTree, friend_filenames is a vector of size 1
+            friend_paths = [str(friend_filenames[0])]
+        else:
+            # This friend is a TChain, join all files with their tree names
+            friend_paths = [
+                "/".join((str(filename), str(chainsubname)))
+                for filename, chainsubname in zip(friend_filenames, friend_chainsubnames)
+            ]
+        friends.append((str(friend_name), str(friend_alias), friend_paths))
+
+    return friends
+
+
+def _build_chain(treename, filelist, friends, start, end):
+    """
+    Builds the TChain processed by a single range of a tree based dataset,
+    together with the chains of its friend trees.
+
+    Args:
+        treename (str): Name of the tree.
+
+        filelist (list[str]): Files of the tree traversed by the range.
+
+        friends (list[tuple]): Names, aliases and paths of the friend trees,
+            as returned by `_get_friend_paths`.
+
+        start (int): Starting entry of the range.
+
+        end (int): Ending entry of the range (exclusive).
+
+    Returns:
+        tuple: The main TChain and the list of TChain objects of its friends.
+        The caller must keep the friends alive while the main chain is used,
+        since a friend that is destroyed is removed from the main chain.
+    """
+    # Build TChain of files for this range:
+    chain = ROOT.TChain(treename)
+    for f in filelist:
+        chain.Add(str(f))
+
+    # We assume 'end' is exclusive
+    chain.SetCacheEntryRange(start, end)
+
+    friend_chains = []
+    for friend_name, friend_alias, friend_paths in friends:
+        # Start a TChain with the current friend treename
+        friend_chain = ROOT.TChain(friend_name)
+        # Add each corresponding file to the TChain
+        for path in friend_paths:
+            friend_chain.Add(path)
+
+        # Set cache on the same range as the parent TChain
+        friend_chain.SetCacheEntryRange(start, end)
+        # Finally add friend TChain to the parent (with alias)
+        chain.AddFriend(friend_chain, friend_alias)
+        friend_chains.append(friend_chain)
+
+    return chain, friend_chains
+
+
 class BaseBackend(ABC):
     """
     Base class for RDataFrame distributed backends.
@@ -123,6 +217,11 @@ class BaseBackend(ABC):
         if isinstance(headnode, TreeHeadNode):
             treename = headnode.treename
             defaultbranches = headnode.defaultbranches
+            # Friend trees are the same for all ranges. Store them here so
+            # they are shipped to the workers once with the mapper, instead
+            # of once per range. Their paths are also computed only once,
+            # rather than by every task.
+            friends = _get_friend_paths(headnode.friendinfo)
         else:
             # Only other head node type is EmptySourceHeadNode at the moment
             treename = None
@@ -132,7 +231,11 @@ class BaseBackend(ABC):
         initialization = self.initialization
 
         # Build the ranges for the current dataset
-        ranges = headnode.build_ranges()
+        try:
+            ranges = headnode.build_ranges()
+        finally:
+            # Cluster layouts are only needed while building the ranges
+            Ranges.clear_clusters_cache()
 
         def mapper(current_range):
             """
@@ -142,8 +245,7 @@ class BaseBackend(ABC):
 
             Args:
                 current_range (Range): A Range named tuple, representing the
-                    range of entries to be processed, their input files and
-                    information about friend trees.
+                    range of entries to be processed and their input files.
 
             Returns:
                 list: This respresents the list of (mergeable)values of all
@@ -162,48 +264,10 @@ class BaseBackend(ABC):
             end = int(current_range.end)
 
             if treename is not None:
-                # Build TChain of files for this range:
-                chain = ROOT.TChain(treename)
-                for f in current_range.filelist:
-                    chain.Add(str(f))
-
-                # We assume 'end' is exclusive
-                chain.SetCacheEntryRange(start, end)
-
-                # Gather information about friend trees. Check that we got an
-                # RFriendInfo struct and that it's not empty
-                if (current_range.friend_info is not None and
-                    not current_range.friend_info.fFriendNames.empty()):
-                    # Zip together the information about friend trees. Each
-                    # element of the iterator represents a single friend tree.
-                    # If the friend is a TChain, the zipped information looks like:
-                    # (name, alias), (file1.root, file2.root, ...), (subname1, subname2, ...)
-                    # If the friend is a TTree, the file list is made of
-                    # only one filename and the list of names of the sub trees
-                    # is empty, so the zipped information looks like:
-                    # (name, alias), (filename.root, ), ()
-                    zipped_friend_info = zip(
-                        current_range.friend_info.fFriendNames,
-                        current_range.friend_info.fFriendFileNames,
-                        current_range.friend_info.fFriendChainSubNames
-                    )
-                    for (friend_name, friend_alias), friend_filenames, friend_chainsubnames in zipped_friend_info:
-                        # Start a TChain with the current friend treename
-                        friend_chain = ROOT.TChain(str(friend_name))
-                        # Add each corresponding file to the TChain
-                        if friend_chainsubnames.empty():
-                            # This friend is a TTree, friend_filenames is a vector of size 1
-                            friend_chain.Add(str(friend_filenames[0]))
-                        else:
-                            # This friend is a TChain, add all files with their tree names
-                            for filename, chainsubname in zip(friend_filenames, friend_chainsubnames):
-                                fullpath = filename + "/" + chainsubname
-                                friend_chain.Add(str(fullpath))
-
-                        # Set cache on the same range as the parent TChain
-                        friend_chain.SetCacheEntryRange(start, end)
-                        # Finally add friend TChain to the parent (with alias)
-                        chain.AddFriend(friend_chain, friend_alias)
+                # The friend chains must stay alive as long as the main chain
+                # is processed
+                chain, friend_chains = _build_chain(
+                    treename, current_range.filelist, friends, start, end)
 
                 if defaultbranches is not None:
                     rdf = ROOT.RDataFrame(chain, defaultbranches)
@@ -220,12 +284,19 @@ class BaseBackend(ABC):
             # Output of the callable
             resultptr_list = computation_graph_callable(rdf, current_range.id, rdf_range=current_range)
 
-            mergeables = [
-                resultptr  # Here resultptr is already the result value
-                if isinstance(resultptr, (dict, list))
-                else ROOT.ROOT.Detail.RDF.GetMergeableValue(resultptr)
-                for resultptr in resultptr_list
-            ]
+            mergeables = []
+            for resultptr in resultptr_list:
+                if isinstance(resultptr, dict):
+                    # Wrap the partial `AsNumpy` arrays in lists. The reducer
+                    # only gathers them, they are concatenated once at the end
+                    mergeables.append({key: [array]
+                                       for key, array in resultptr.items()})
+                elif isinstance(resultptr, list):
+                    # Here resultptr is already the result value
+                    mergeables.append(resultptr)
+                else:
+                    mergeables.append(
+                        ROOT.ROOT.Detail.RDF.GetMergeableValue(resultptr))
             return mergeables
 
         def reducer(mergeables_out, mergeables_in):
@@ -249,8 +320,8 @@ class BaseBackend(ABC):
 
             import ROOT
 
-            # We still need the list index to modify results of `Snapshot` and
-            # `AsNumpy` in place.
+            # We still need the list index to modify results of `Snapshot` in
+            # place.
             for index, (mergeable_out, mergeable_in) in enumerate(
                     zip(mergeables_out, mergeables_in)):
                 # Create a global list with all the files of the partial
@@ -258,19 +329,12 @@ class BaseBackend(ABC):
                 if isinstance(mergeable_out, list):
                     mergeables_out[index].extend(mergeable_in)
 
-                # Concatenate the partial numpy arrays along the same key of
-                # the dictionary.
+                # Gather the lists of partial numpy arrays along the same key
+                # of the dictionary. Concatenating them at every step would
+                # copy the arrays again at each level of the reduction.
                 elif isinstance(mergeable_out, dict):
-                    # Import numpy lazily
-                    try:
-                        import numpy
-                    except ImportError:
-                        raise ImportError("Failed to import numpy during distributed RDataFrame reduce step.")
-                    mergeables_out[index] = {
-                        key: numpy.concatenate([mergeable_out[key],
-                                                mergeable_in[key]])
-                        for key in mergeable_out
-                    }
+                    for key in mergeable_out:
+                        mergeable_out[key].extend(mergeable_in[key])
 
                 # The `MergeValues` function modifies the arguments in place
                 # so there's no need to access the list elements.
@@ -297,7 +361,14 @@ class BaseBackend(ABC):
                 # Create a new rdf with the chain and return that to user
                 node.value = self.make_dataframe(snapshot_chain)
             elif node.operation.name == "AsNumpy":
-                node.value = value
+                # Import numpy lazily
+                try:
+                    import numpy
+                except ImportError:
+                    raise ImportError("Failed to import numpy after distributed RDataFrame reduce step.")
+                # Concatenate all the partial arrays of each column at once
+                node.value = {key: numpy.concatenate(arrays)
+                              for key, arrays in value.items()}
             else:
                 node.value = value.GetValue()
 
@@ -1,5 +1,6 @@
 import glob
 import logging
+import os
 import warnings
 
 import ROOT
@@ -129,6 +130,11 @@ class TreeHeadNode(Node.Node):
         self.args = args
         self.npartitions = npartitions
 
+        # Ranges already built for this dataset, keyed by the number of
+        # partitions, the tree name and the identity of the input files (see
+        # `_get_files_identity`)
+        self._ranges_cache = {}
+
     # TODO: Decide whether to remove/change the property or the getter
     @property
     def tree(self):
@@ -285,28 +291,71 @@ class TreeHeadNode(Node.Node):
         Returns:
             (ROOT.Internal.TreeUtils.RFriendInfo): A C++ struct holding
                 information about friend trees. If the user did not supply a
-                TTree or TChain as input to the constructor, returns None.
+                TTree or TChain as input to the constructor, or if the tree
+                has no friends, returns None.
         """
         if isinstance(self.args[0], ROOT.TTree):
-            return ROOT.Internal.TreeUtils.GetFriendInfo(self.args[0])
-        else:
-            return None
+            friend_info = ROOT.Internal.TreeUtils.GetFriendInfo(self.args[0])
+            # Avoid serializing an empty struct to send it to the workers
+            if not friend_info.fFriendNames.empty():
+                return friend_info
+
+        return None
+
+    @staticmethod
+    def _get_files_identity(filenames):
+        """
+        Identifies the current version of the input files by their name, size
+        and modification time, so that ranges built for a file are not reused
+        once the file has been rewritten.
+
+        Returns:
+            (tuple, None): One (filename, size, mtime) tuple per input file, or
+                None if some file is not on the local filesystem, in which case
+                its changes cannot be detected without opening it.
+        """
+        identity = []
+        for filename in filenames:
+            try:
+                stat = os.stat(filename)
+            except OSError:
+                return None
+            identity.append((filename, stat.st_size, stat.st_mtime))
+
+        return tuple(identity)
 
     def build_ranges(self):
         """Build the ranges for this dataset."""
-        # Empty datasets cannot be processed distributedly
-        if not self.nentries:
-            raise RuntimeError(
-                ("Cannot build a distributed RDataFrame with zero entries. "
-                 "Distributed computation will fail. "))
+        # The tree name and input files are parsed from the constructor
+        # arguments each time the properties are accessed, so retrieve them
+        # only once here.
+        treename = self.treename
+        inputfiles = self.inputfiles
+
+        # Running multiple computation graphs on the same dataset would build
+        # the same ranges again, opening all the files of the dataset. Ranges
+        # are only reused if none of the files changed in the meantime.
+        filesidentity = self._get_files_identity(inputfiles)
+        cachekey = (self.npartitions, treename, filesidentity)
+        if filesidentity is not None and cachekey in self._ranges_cache:
+            logger.debug("Reusing ranges built previously for tree %s", treename)
+            return self._ranges_cache[cachekey]
 
         logger.debug("Building ranges for tree %s with the "
-                     "following input files:\n%s", self.treename, self.inputfiles)
+                     "following input files:\n%s", treename, inputfiles)
 
         # Retrieve a tuple of clusters for all files of the tree
-        clustersinfiles = Ranges.get_clusters(self.treename, self.inputfiles)
+        clustersinfiles = Ranges.get_clusters(treename, inputfiles)
         numclusters = len(clustersinfiles)
 
+        # Empty datasets cannot be processed distributedly. A dataset without
+        # clusters has no entries, so there is no need to open all the files
+        # once more in a TChain just to count them.
+        if not numclusters:
+            raise RuntimeError(
+                ("Cannot build a distributed RDataFrame with zero entries. "
+                 "Distributed computation will fail. "))
+
         # TODO: This shouldn't be triggered if len(clustersinfiles) == 1. The
         # current minimum amount of partitions is 2. We need a robust reducer
         # that smartly becomes no-op if npartitions == 1 to avoid this.
@@ -319,4 +368,12 @@ class TreeHeadNode(Node.Node):
 
         logger.debug("%s clusters will be split along %s partitions.",
                      numclusters, self.npartitions)
-        return Ranges.get_clustered_ranges(clustersinfiles, self.npartitions, self.treename, self.friendinfo)
+        ranges = Ranges.get_clustered_ranges(clustersinfiles, self.npartitions, treename)
+
+        if filesidentity is not None:
+            # The number of partitions may have been restricted above, which
+            # is the value found at the next call. Store the ranges under both
+            # the requested and the restricted number of partitions.
+            self._ranges_cache[cachekey] = ranges
+            self._ranges_cache[(self.npartitions, treename, filesidentity)] = ranges
+        return ranges
@@ -1,7 +1,5 @@
 import logging
 
-from functools import total_ordering
-
 import ROOT
 
 logger = logging.getLogger(__name__)
@@ -24,6 +22,10 @@ class EmptySourceRange(object):
     end (int): Ending entry of this range.
     """
 
+    # Ranges are created once per partition and serialized to the workers.
+    # Without a per-instance __dict__ they are lighter in memory.
+    __slots__ = ("id", "start", "end")
+
     def __init__(self, rangeid, start, end):
         """set attributes"""
         self.id = rangeid
@@ -51,19 +53,21 @@ class TreeRange(object):
 
     filelist (list[str]): List of files to be processed with this range.
 
-    friend_info (ROOT.Internal.TreeUtils.RFriendInfo): Information about friend trees.
+    Information about friend trees is the same for every range of a dataset,
+    so it is not stored here. It is sent to the workers only once, together
+    with the mapper function (see `BaseBackend.execute`).
     """
 
-    def __init__(self, rangeid, start, end, filelist, friend_info):
+    __slots__ = ("id", "start", "end", "filelist")
+
+    def __init__(self, rangeid, start, end, filelist):
         """set attributes"""
         self.id = rangeid
         self.start = start
         self.end = end
         self.filelist = filelist
-        self.friend_info = friend_info
 
 
-@total_ordering
 class FileAndIndex(object):
     """
     This is a pair (filename, index) that represents the index of the current
@@ -76,28 +80,14 @@ class FileAndIndex(object):
     index (int): The index of the file in the list of input files.
     """
 
+    __slots__ = ("filename", "fileindex")
+
     def __init__(self, filename, fileindex):
         """set attributes"""
         self.filename = filename
         self.fileindex = fileindex
 
-    def __lt__(self, other):
-        """Total ordering is defined to be able to sort a set[FileAndIndex]."""
-        return self.fileindex < other.fileindex
-
-    def __eq__(self, other):
-        """Defined in compliance with total_ordering decorator"""
-        return self.fileindex == other.fileindex
-
-    def __hash__(self):
-        """
-        This type needs to be hashable to be part of a set in
-        get_clustered_ranges
-        """
-        return hash(self.filename)
-
 
-@total_ordering
 class ChainCluster(object):
     """
     Descriptor of a cluster of entries in a TChain. Uses global entries rather
@@ -116,6 +106,9 @@ class ChainCluster(object):
         belongs to and the index of that file in the chain.
     """
 
+    # One instance is created for every cluster of the dataset
+    __slots__ = ("start", "end", "offset", "filetuple")
+
     def __init__(self, start, end, offset, filetuple):
         """set attributes"""
         self.start = start
@@ -123,15 +116,8 @@ class ChainCluster(object):
         self.offset = offset
         self.filetuple = filetuple
 
-    def __lt__(self, other):
-        """
-        In `get_clustered_ranges` we need to retrieve the minimum and maximum
-        entries in a certain list of clusters.
-        """
-        return self.start < other.start and self.end < other.end
-
     def __eq__(self, other):
-        """Defined in compliance with total_ordering decorator"""
+        """Two clusters are equal if they span the same entries of one file."""
         return (self.start == other.start and
                self.end == other.end and
                self.offset == other.offset and
@@ -139,47 +125,67 @@ class ChainCluster(object):
                self.filetuple.fileindex == other.filetuple.fileindex)
 
 
-def _n_even_chunks(iterable, n_chunks):
+def _n_even_chunks_indices(length, n_chunks):
     """
-    Yield `n_chunks` as even chunks as possible from `iterable`. Though generic,
-    this function is used in _get_clustered_ranges to split a list of clusters
-    into multiple sublists. Each sublist will hold the clusters that should fit
-    in a single partition of the distributed dataset::
+    Yield `n_chunks` (start, stop) pairs of indices splitting a sequence of
+    `length` elements in chunks as even as possible. For example, splitting 10
+    clusters in 3 chunks yields::
 
-        [
-            # Partition 1 will process the following clusters
-            [
-                (start_0_0, end_0_0, offset_0, (filename_0, 0)),
-                (start_0_1, end_0_1, offset_0, (filename_0, 0)),
-                ...,
-                (start_1_0, end_1_0, offset_1, (filename_1, 1)),
-                (start_1_1, end_1_1, offset_1, (filename_1, 1)),
-                ...,
-                (start_n_0, end_n_0, offset_n, (filename_n, n)),
-                (start_n_1, end_n_1, offset_n, (filename_n, n)),
-                ...
-            ],
-            # Partition 2 will process these other clusters
-            [
-                (start_n+1_0, end_n+1_0, offset_n+1, (filename_n+1, n+1)),
-                (start_n+1_1, end_n+1_1, offset_n+1, (filename_n+1, n+1)),
-                ...,
-                (start_m_0, end_m_0, offset_m, (filename_m, m)),
-                (start_m_1, end_m_1, offset_m, (filename_m, m)),
-                ...
-            ],
-            ...
-        ]
+        (0, 3), (3, 7), (7, 10)
 
+    get_clustered_ranges indexes the list of clusters of the dataset with
+    these pairs, without copying the clusters of each chunk in a new list.
+    All the clusters between `start` (included) and `stop` (excluded) are
+    processed in the same partition of the distributed dataset.
     """
     last = 0
-    itlenght = len(iterable)
     for i in range(1, n_chunks + 1):
-        cur = int(round(i * (itlenght / n_chunks)))
-        yield iterable[last:cur]
+        cur = int(round(i * (length / n_chunks)))
+        yield last, cur
         last = cur
 
 
+# Cache of the cluster layout of the trees read by `_get_clusters_in_file`,
+# keyed by (treename, filename).
+_clusters_cache = {}
+
+
+def _get_clusters_in_file(treename, filename):
+    """
+    Retrieve the number of entries and the cluster boundaries of a tree stored
+    in a file. The result is cached, so that a file is opened only once even if
+    it appears multiple times in the dataset.
+
+    Args:
+        treename (str): Name of the TTree.
+        filename (str): Name of the ROOT file holding the tree.
+
+    Returns:
+        tuple: A pair with the number of entries of the tree and a tuple of
+        (start, end) pairs with the local boundaries of each cluster.
+    """
+    key = (treename, filename)
+    if key not in _clusters_cache:
+        # Iterating over the clusters in C++ avoids one call from Python to
+        # the cluster iterator for every cluster of the tree
+        clusters, entries = ROOT.Internal.TreeUtils.GetClustersAndEntries(
+            treename, filename)
+
+        boundaries = tuple((start, end) for start, end in clusters)
+        _clusters_cache[key] = (entries, boundaries)
+
+    return _clusters_cache[key]
+
+
+def clear_clusters_cache():
+    """
+    Forget the cluster layouts cached by `_get_clusters_in_file`. Files may be
+    modified between two distributed executions, so the cache is emptied
+    once the ranges of an execution are built.
+    """
+    _clusters_cache.clear()
+
+
 def get_clusters(treename, filelist):
     """
     Extract a list of cluster boundaries for the given tree and files
@@ -214,25 +220,22 @@ def get_clusters(treename, filelist):
     fileindex = 0
 
     for filename in filelist:
-        f = ROOT.TFile.Open(filename)
-        t = f.Get(treename)
+        entries, boundaries = _get_clusters_in_file(treename, filename)
 
-        entries = t.GetEntriesFast()
-        it = t.GetClusterIterator(0)
-        start = it()
-        end = 0
-
-        while start < entries:
-            end = it()
+        # All the clusters of a file share the same descriptor of that file
+        filetuple = FileAndIndex(filename, fileindex)
+        for start, end in boundaries:
             clusters.append(ChainCluster(start + offset, end + offset, offset,
-                                    FileAndIndex(filename, fileindex)))
-            start = end
+                                         filetuple))
 
         fileindex += 1
         offset += entries
 
-    logger.debug("Returning files with their clusters:\n%s",
-                 "\n\n".join(map(str, clusters)))
+    # Joining the descriptions of all clusters is expensive for large
+    # datasets, only do it if the message is going to be emitted
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Returning files with their clusters:\n%s",
+                     "\n\n".join(map(str, clusters)))
 
     return clusters
 
@@ -255,34 +258,24 @@ def get_balanced_ranges(nentries, npartitions):
             the start and end entry of the corresponding range.
     """
 
-    partition_size = nentries // npartitions
-
-    i = 0  # Iterator
+    if not nentries:
+        return []
 
-    ranges = []
+    # There cannot be more non-empty ranges than entries
+    npartitions = min(npartitions, nentries)
 
-    remainder = nentries % npartitions
+    partition_size, remainder = divmod(nentries, npartitions)
 
-    rangeid = 0 # Keep track of the current range id
-    while i < nentries:
-        # Start value of current range
-        start = i
-        end = i = start + partition_size
+    # The first `remainder` ranges hold one entry more than the others, so the
+    # boundary before the i-th range is shifted by min(i, remainder)
+    bounds = [i * partition_size + min(i, remainder)
+              for i in range(npartitions + 1)]
 
-        if remainder:
-            # If the modulo value is not
-            # exhausted, add '1' to the end
-            # of the current range
-            end = i = end + 1
-            remainder -= 1
+    return [EmptySourceRange(rangeid, start, end)
+            for rangeid, (start, end) in enumerate(zip(bounds[:-1], bounds[1:]))]
 
-        ranges.append(EmptySourceRange(rangeid, start, end))
-        rangeid += 1
 
-    return ranges
-
-
-def get_clustered_ranges(clustersinfiles, npartitions, treename, friend_info):
+def get_clustered_ranges(clustersinfiles, npartitions, treename):
     """
     Builds ``TreeRange`` objects taking into account the clusters of the
     dataset. Each range will represent the entries processed within a single
@@ -292,37 +285,33 @@ def get_clustered_ranges(clustersinfiles, npartitions, treename, friend_info):
         clustersinfiles (list): List of namedtuples representing clusters in
             the input files of the current dataset.
 
-        npartitions (int): Number of ranges that will be produced.
+        npartitions (int): Number of ranges that will be produced. A range
+            holds at least one cluster, so only one range per cluster is
+            produced if `npartitions` is greater than the number of clusters.
 
         treename (str): Name of the tree.
 
-        friend_info (ROOT.Internal.TreeUtils.RFriendInfo): Information about friend
-            trees.
-
     Returns:
         list[DistRDF.Ranges.TreeRange]: Each element of the list represents one
             range in which the dataset has been split for distributed execution.
-            Each `TreeRange` contains a starting entry, an ending entry, the
-            list of files that are traversed to get all the entries and
-            information about friend trees::
+            Each `TreeRange` contains a starting entry, an ending entry and the
+            list of files that are traversed to get all the entries::
 
             [
                 TreeRange(start=0,
                     end=1500,
                     filelist=['filename_1.root',
-                              'filename_2.root'],
-                    friend_info=None),
+                              'filename_2.root']),
                 TreeRange(start=1500,
                     end=3000,
                     filelist=['filename_2..root',
-                              'filename_3.root'],
-                    friend_info=None)
+                              'filename_3.root'])
             ]
 
     """
 
     """
-    This list comprehension builds ``TreeRange`` tuples with the following
+    The loop below builds ``TreeRange`` objects with the following
     elements:
     1. ``start``: The minimum entry among all the clusters considered in a
         given partition. The offset of the first cluster of the list is
@@ -347,12 +336,11 @@ def get_clustered_ranges(clustersinfiles, npartitions, treename, friend_info):
         second element of this tuple corresponds to the index of the file in
         the input `TChain`. This way all files can be uniquely identified,
         even if there is some repetition (e.g. when building a TChain with
-        multiple instances of the same file). The algorithm to retrieve the
-        correct files for each range takes the unique filenames from the list
-        of clusters and sorts them by their index to keep the original order.
-        In each file only the clusters needed to process the clustered range
-        will be read.
-    4. ``friend_info``: Information about friend trees.
+        multiple instances of the same file). The unique files are collected
+        once, in chain order, from the whole list of clusters. The files of
+        each range are the slice of that list going from the file of its first
+        cluster to the file of its last cluster. In each file only the
+        clusters needed to process the clustered range will be read.
     In each range, the offset of the first file is always subtracted to the
     ``start`` and ``end`` entries. This is needed to maintain a reference of
     the entries of the range with respect to the list of files that hold
@@ -364,13 +352,11 @@ def get_clustered_ranges(clustersinfiles, npartitions, treename, friend_info):
         TreeRange(start=0,
                 end=20000,
                 filelist=['tree10000entries10clusters.root',
-                        'tree20000entries10clusters.root'],
-                friend_info=None)
+                        'tree20000entries10clusters.root'])
         TreeRange(start=10000,
                 end=50000,
                 filelist=['tree20000entries10clusters.root',
-                        'tree30000entries10clusters.root'],
-                friend_info=None)
+                        'tree30000entries10clusters.root'])
     The first ``TreeRange`` will read the first 10000 entries from the first
     file, then switch to the second file and read the first 10000 entries.
     The second ``TreeRange`` will start from entry number 10000 of the second
@@ -378,25 +364,42 @@ def get_clustered_ranges(clustersinfiles, npartitions, treename, friend_info):
     the third file and read the whole 30000 entries there.
     """
 
-    # TODO: Make this passage more clear. Maybe split the comprehension in more
-    # parts.
-    clustered_ranges = [
-        TreeRange(
-            rangeid,  # type: int
-            min(clusters).start - clusters[0].offset,  # type: int
-            max(clusters).end - clusters[0].offset,  # type: int
-            [
-                filetuple.filename
-                for filetuple in sorted(set([
-                    cluster.filetuple for cluster in clusters
-                ]), key=lambda curtuple: curtuple.fileindex)
-            ],  # type: list[str]
-            friend_info  # type: ROOT.Internal.TreeUtils.RFriendInfo
-        )  # type: DistRDF.Ranges.TreeRange
-        for rangeid, clusters in enumerate(_n_even_chunks(clustersinfiles, npartitions))
-    ]
-
-    logger.debug("Created following clustered ranges:\n%s",
-                 "\n\n".join(map(str, clustered_ranges)))
+    # Avoid empty chunks of clusters
+    npartitions = min(npartitions, len(clustersinfiles))
+
+    # Clusters are sorted by their position in the chain, so the files holding
+    # them appear in chain order too. Store the list of filenames only once,
+    # together with the position of each file in that list. The files of each
+    # range are then a contiguous slice of this list.
+    chainfiles = []  # type: list[str]
+    filepositions = {}  # type: dict[int, int]
+    for cluster in clustersinfiles:
+        fileindex = cluster.filetuple.fileindex
+        if fileindex not in filepositions:
+            filepositions[fileindex] = len(chainfiles)
+            chainfiles.append(cluster.filetuple.filename)
+
+    clustered_ranges = []
+    chunks = _n_even_chunks_indices(len(clustersinfiles), npartitions)
+    for rangeid, (firstindex, stopindex) in enumerate(chunks):
+        # Clusters are sorted and contiguous, so the range spans from the
+        # start of its first cluster to the end of its last one. Entries of
+        # the range are local to its first file.
+        firstcluster = clustersinfiles[firstindex]
+        lastcluster = clustersinfiles[stopindex - 1]
+        offset = firstcluster.offset
+        start = firstcluster.start - offset
+        end = lastcluster.end - offset
+
+        firstfile = filepositions[firstcluster.filetuple.fileindex]
+        lastfile = filepositions[lastcluster.filetuple.fileindex]
+        filelist = chainfiles[firstfile:lastfile + 1]
+
+        clustered_ranges.append(
+            TreeRange(rangeid, start, end, filelist))
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Created following clustered ranges:\n%s",
+                     "\n\n".join(map(str, clustered_ranges)))
 
     return clustered_ranges
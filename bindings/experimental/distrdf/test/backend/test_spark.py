@@ -3,7 +3,9 @@ import sys
 import unittest
 
 import DistRDF
+import numpy
 import pyspark
+import ROOT
 from DistRDF.Backends import Spark
 from DistRDF.Backends.Spark import Backend
 
@@ -326,5 +328,55 @@ class ChangeAttributeTest(unittest.TestCase):
         self.assertEqual(df._headnode.npartitions, 4)
 
 
+class AsNumpyTest(unittest.TestCase):
+    """Check the result of AsNumpy in a distributed execution"""
+
+    @classmethod
+    def setUpClass(cls):
+        """
+        Synchronize PYSPARK_PYTHON variable to the current Python executable.
+
+        Needed to avoid mismatch between python versions on driver and on
+        the fake executor on the same machine.
+        """
+        os.environ["PYSPARK_PYTHON"] = sys.executable
+
+    def tearDown(self):
+        """Stop any created SparkContext"""
+        pyspark.SparkContext.getOrCreate().stop()
+
+    @classmethod
+    def tearDownClass(cls):
+        """
+        Stop the SparkContext and reset environment variable.
+        """
+        os.environ["PYSPARK_PYTHON"] = ""
+
+    def test_asnumpy_with_multiple_partitions(self):
+        """
+        Check that the arrays of AsNumpy gathered from multiple partitions are
+        concatenated in the order of the entries of the dataset, giving the
+        same numpy arrays as a local RDataFrame.
+        """
+        treename = "myTree"
+        filename = "test_asnumpy_with_multiple_partitions.root"
+
+        # Write one cluster every 10 entries, so that the dataset can be split
+        # in multiple partitions
+        opts = ROOT.RDF.RSnapshotOptions()
+        opts.fAutoFlush = 10
+        ROOT.RDataFrame(100).Define("x", "(int)rdfentry_").Snapshot(
+            treename, filename, ["x"], opts)
+        self.addCleanup(os.remove, filename)
+
+        df = Spark.RDataFrame(treename, filename, npartitions=4)
+        npy_distributed = df.AsNumpy(["x"])
+        npy_local = ROOT.RDataFrame(treename, filename).AsNumpy(["x"])
+
+        self.assertEqual(df._headnode.npartitions, 4)
+        self.assertIsInstance(npy_distributed["x"], numpy.ndarray)
+        self.assertTrue(numpy.array_equal(npy_distributed["x"], npy_local["x"]))
+
+
 if __name__ == "__main__":
     unittest.main()
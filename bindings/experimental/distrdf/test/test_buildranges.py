@@ -1,8 +1,11 @@
 from DistRDF.HeadNode import get_headnode
 from DistRDF import Ranges
+import os
 import warnings
 import unittest
 
+import ROOT
+
 
 def emptysourceranges_to_tuples(ranges):
     """Convert EmptySourceRange objects to tuples with the shape (start, end)"""
@@ -25,6 +28,10 @@ class BuildRangesTest(unittest.TestCase):
     adn the RangesBuilder class.
     """
 
+    def tearDown(self):
+        """Do not share cached cluster layouts between tests."""
+        Ranges.clear_clusters_cache()
+
     def test_nentries_multipleOf_npartitions(self):
         """
         `BuildRanges` method when the number of entries is a multiple of the
@@ -117,9 +124,8 @@ class BuildRangesTest(unittest.TestCase):
         filelist = ["backend/Slimmed_ntuple.root"]
         npartitions = 1
         clustersinfiles = Ranges.get_clusters(treename, filelist)
-        friendinfo = None
 
-        crs = Ranges.get_clustered_ranges(clustersinfiles, npartitions, treename, friendinfo)
+        crs = Ranges.get_clustered_ranges(clustersinfiles, npartitions, treename)
         ranges = treeranges_to_tuples(crs)
 
         ranges_reqd = [(0, 10, ["backend/Slimmed_ntuple.root"])]
@@ -307,3 +313,134 @@ class BuildRangesTest(unittest.TestCase):
         ]
 
         self.assertListEqual(ranges, ranges_reqd)
+
+    def test_clusters_with_repeated_file(self):
+        """
+        Check that get_clusters gives each occurrence of a file repeated in the
+        dataset its own offset and index, even though the cluster layout of
+        the file is read only once.
+        """
+
+        treename = "myTree"
+        filelist = ["backend/2clusters.root", "backend/2clusters.root"]
+
+        treeutils = ROOT.Internal.TreeUtils
+        getclusters = treeutils.GetClustersAndEntries
+        readfiles = []
+
+        def counting_getclusters(treename, filename):
+            readfiles.append(filename)
+            return getclusters(treename, filename)
+
+        treeutils.GetClustersAndEntries = counting_getclusters
+        try:
+            clusters = Ranges.get_clusters(treename, filelist)
+        finally:
+            treeutils.GetClustersAndEntries = getclusters
+
+        clusters_tuples = [
+            (c.start, c.end, c.offset, c.filetuple.fileindex)
+            for c in clusters
+        ]
+        clusters_reqd = [
+            (0, 777, 0, 0),
+            (777, 1000, 0, 0),
+            (1000, 1777, 1000, 1),
+            (1777, 2000, 1000, 1)
+        ]
+
+        self.assertListEqual(clusters_tuples, clusters_reqd)
+        self.assertListEqual(readfiles, ["backend/2clusters.root"])
+
+    def test_clustered_ranges_with_more_partitions_than_clusters(self):
+        """
+        Check that get_clustered_ranges creates one range per cluster when
+        more partitions than clusters are requested.
+        """
+
+        treename = "myTree"
+        filelist = ["backend/2clusters.root", "backend/4clusters.root"]
+        npartitions = 8
+        clustersinfiles = Ranges.get_clusters(treename, filelist)
+
+        crs = Ranges.get_clustered_ranges(clustersinfiles, npartitions, treename)
+        ranges = treeranges_to_tuples(crs)
+
+        ranges_reqd = [
+            (0, 777, ["backend/2clusters.root"]),
+            (777, 1000, ["backend/2clusters.root"]),
+            (0, 250, ["backend/4clusters.root"]),
+            (250, 500, ["backend/4clusters.root"]),
+            (500, 750, ["backend/4clusters.root"]),
+            (750, 1000, ["backend/4clusters.root"])
+        ]
+
+        self.assertListEqual(ranges, ranges_reqd)
+
+    def test_buildranges_reuses_clustered_ranges(self):
+        """
+        Check that build_ranges returns the ranges built previously for the
+        same dataset and number of partitions, and builds new ones when the
+        number of partitions changes.
+        """
+        headnode = create_dummy_headnode("myTree", "backend/4clusters.root")
+        headnode.npartitions = 2
+
+        crs_first = headnode.build_ranges()
+        crs_second = headnode.build_ranges()
+
+        self.assertIs(crs_first, crs_second)
+
+        headnode.npartitions = 4
+        ranges = treeranges_to_tuples(headnode.build_ranges())
+
+        ranges_reqd = [
+            (0, 250, ["backend/4clusters.root"]),
+            (250, 500, ["backend/4clusters.root"]),
+            (500, 750, ["backend/4clusters.root"]),
+            (750, 1000, ["backend/4clusters.root"])
+        ]
+
+        self.assertListEqual(ranges, ranges_reqd)
+
+    def test_buildranges_reuses_ranges_with_restricted_partitions(self):
+        """
+        Check that build_ranges reuses the ranges built previously when the
+        number of partitions was restricted to the number of clusters.
+        """
+        headnode = create_dummy_headnode("myTree", "backend/4clusters.root")
+        headnode.npartitions = 8
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)
+            crs_first = headnode.build_ranges()
+        crs_second = headnode.build_ranges()
+
+        self.assertEqual(headnode.npartitions, 4)
+        self.assertIs(crs_first, crs_second)
+
+    def test_buildranges_after_rewriting_file(self):
+        """
+        Check that build_ranges does not reuse the ranges built for a file
+        that has been rewritten since.
+        """
+        treename = "myTree"
+        filename = "test_buildranges_after_rewriting_file.root"
+
+        ROOT.RDataFrame(100).Define("x", "rdfentry_").Snapshot(
+            treename, filename)
+        self.addCleanup(os.remove, filename)
+        headnode = create_dummy_headnode(treename, filename)
+        headnode.npartitions = 1
+
+        crs_first = headnode.build_ranges()
+
+        ROOT.RDataFrame(200).Define("x", "rdfentry_").Snapshot(
+            treename, filename)
+        crs_second = headnode.build_ranges()
+
+        self.assertIsNot(crs_first, crs_second)
+        self.assertListEqual(treeranges_to_tuples(crs_first),
+                             [(0, 100, [filename])])
+        self.assertListEqual(treeranges_to_tuples(crs_second),
+                             [(0, 200, [filename])])
@@ -139,4 +139,22 @@ class FriendInfoTest(unittest.TestCase):
         # Remove unnecessary .root files
         os.remove(main_tree_filename)
         for filename in actualfriendchainfilenames:
-            os.remove(filename)
\ No newline at end of file
+            os.remove(filename)
+
+    def test_friend_info_without_friends(self):
+        """
+        Check that no friend information is retrieved from a tree without
+        friends
+        """
+        main_tree_name = "T"
+        main_tree_filename = "treeparent.root"
+        self.create_main_tree(main_tree_name, main_tree_filename)
+        maintree = ROOT.TChain(main_tree_name)
+        maintree.Add(main_tree_filename)
+
+        headnode = create_dummy_headnode(maintree)
+
+        self.assertIsNone(headnode._get_friend_info())
+
+        # Remove unnecessary .root files
+        os.remove(main_tree_filename)
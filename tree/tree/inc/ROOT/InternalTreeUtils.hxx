@@ -18,6 +18,8 @@
 #ifndef ROOT_INTERNAL_TREEUTILS_H
 #define ROOT_INTERNAL_TREEUTILS_H
 
+#include "RtypesCore.h" // Long64_t
+
 #include <utility> // std::pair
 #include <vector>
 #include <string>
@@ -60,6 +62,8 @@ struct RFriendInfo {
 std::vector<std::string> GetFileNamesFromTree(const TTree &tree);
 RFriendInfo GetFriendInfo(const TTree &tree);
 std::vector<std::string> GetTreeFullPaths(const TTree &tree);
+std::pair<std::vector<std::pair<Long64_t, Long64_t>>, Long64_t>
+GetClustersAndEntries(const std::string &treename, const std::string &filename);
 
 } // namespace TreeUtils
 } // namespace Internal
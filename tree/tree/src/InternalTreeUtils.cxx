@@ -12,6 +12,7 @@
 #include "TFile.h"
 #include "TFriendElement.h"
 
+#include <memory> // std::unique_ptr
 #include <utility> // std::pair
 #include <vector>
 #include <stdexcept> // std::runtime_error
@@ -221,6 +222,46 @@ std::vector<std::string> GetTreeFullPaths(const TTree &tree)
    return {tree.GetName()};
 }
 
+////////////////////////////////////////////////////////////////////////////////
+/// \fn std::pair<std::vector<std::pair<Long64_t, Long64_t>>, Long64_t> GetClustersAndEntries(const std::string &treename, const std::string &filename)
+/// \ingroup tree
+/// \brief Get the cluster boundaries and the number of entries of a tree stored in a file.
+/// \param[in] treename The name of the tree.
+/// \param[in] filename The name of the file where the tree is stored.
+/// \throws std::runtime_error If the file could not be opened or the tree could
+///         not be found in the file.
+/// \return A pair with a vector of (start, end) entries of each cluster of the
+///         tree, with the end entry exclusive, and the number of entries of the
+///         tree. The entries are local to the tree in the file.
+///
+/// All the clusters are traversed in compiled code, so that callers from
+/// Python (e.g. the distributed RDataFrame ranges) don't need one call to the
+/// cluster iterator per cluster.
+std::pair<std::vector<std::pair<Long64_t, Long64_t>>, Long64_t>
+GetClustersAndEntries(const std::string &treename, const std::string &filename)
+{
+   TDirectory::TContext c;
+   std::unique_ptr<TFile> f(TFile::Open(filename.c_str())); // need TFile::Open to load plugins if need be
+   if (!f || f->IsZombie()) {
+      throw std::runtime_error("GetClustersAndEntries: an error occurred while opening file \"" + filename + "\"");
+   }
+   auto *t = f->Get<TTree>(treename.c_str()); // t will be deleted by f
+   if (!t) {
+      throw std::runtime_error("GetClustersAndEntries: an error occurred while getting tree \"" + treename +
+                               "\" from file \"" + filename + "\"");
+   }
+
+   auto clusterIter = t->GetClusterIterator(0);
+   Long64_t start = 0ll;
+   const Long64_t entries = t->GetEntriesFast();
+   std::vector<std::pair<Long64_t, Long64_t>> clusters;
+   while ((start = clusterIter()) < entries) {
+      clusters.emplace_back(start, clusterIter.GetNextEntry());
+   }
+
+   return {std::move(clusters), entries};
+}
+
 } // namespace TreeUtils
 } // namespace Internal
 } // namespace ROOT
@@ -1,3 +1,4 @@
+#include "ROOT/InternalTreeUtils.hxx"
 #include "TFile.h"
 #include "TTree.h"
 #include "TBranch.h"
@@ -53,3 +54,17 @@ TEST_F(TTreeClusterTest, countBaskets)
 
    delete file;
 }
+
+TEST_F(TTreeClusterTest, GetClustersAndEntries)
+{
+   const auto clustersAndEntries = ROOT::Internal::TreeUtils::GetClustersAndEntries("tree", "TTreeClusterTest.root");
+   const auto &clusters = clustersAndEntries.first;
+
+   ASSERT_EQ(clusters.size(), 2u);
+   EXPECT_EQ(clusters[0], std::make_pair(0ll, 500ll));
+   EXPECT_EQ(clusters[1], std::make_pair(500ll, 1000ll));
+   EXPECT_EQ(clustersAndEntries.second, 1000ll);
+
+   EXPECT_THROW(ROOT::Internal::TreeUtils::GetClustersAndEntries("notree", "TTreeClusterTest.root"),
+                std::runtime_error);
+}